@@ -4,14 +4,24 @@ Simple Flask backend server for CVRP API
 This server handles requests from the Depot agent and provides an API endpoint
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, send_file
 from flask_cors import CORS
 import json
 import time
 import uuid
 import os
+import mmap
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict, deque
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to the standard library encoder
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
@@ -19,14 +29,229 @@ CORS(app)  # Enable CORS for frontend integration
 BACKEND_DIR = Path(__file__).parent.absolute()
 PROJECT_ROOT = BACKEND_DIR.parent
 LOGS_DIR = PROJECT_ROOT / "logs"
+# SQLite database holding CVRP requests and solutions across restarts
+DB_PATH = PROJECT_ROOT / "cvrp.db"
+LOG_FILE_SUFFIX = "_conversations.log"
+# Directory listings younger than this may still change within the same mtime tick
+LOG_LIST_SETTLE_NS = 1_000_000_000
+# How long a log listing is served without even re-checking the directory mtime
+LOG_LIST_TTL_SECONDS = 0.5
+# Completed requests and their solutions are kept this long for the frontend to fetch
+COMPLETED_REQUEST_TTL_SECONDS = 3600
+# A request claimed by the MRA but not solved within this long is handed out again
+PROCESSING_LEASE_SECONDS = 600
+# Number of encoded /log/<agent_name> bodies kept for repeated polls of unchanged logs
+LOG_BODY_CACHE_SIZE = 16
+# Total size of the encoded bodies held by that cache
+LOG_BODY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Worker threads for the production WSGI server - movement streams and long-polls each hold one
+SERVER_THREADS = 32
+# Upper bound for ?wait= on GET /api/solve-cvrp?action=poll (long-polling)
+MAX_POLL_WAIT_SECONDS = 30.0
+# Number of recent position changes kept for /api/movement/stream clients to catch up from
+MOVEMENT_CHANGE_BUFFER = 1024
+# Idle movement streams send a keepalive comment this often
+MOVEMENT_STREAM_KEEPALIVE_SECONDS = 2.0
+
+def dumps_json(payload):
+    """Serialize payload to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Build a JSON response, serialized with orjson when it is installed"""
+    return app.response_class(dumps_json(payload), status=status, mimetype='application/json')
+
+# Bodies of the most frequent fixed responses, serialized once at import.
+# Each request still gets its own Response object: flask-cors writes the
+# caller's origin onto the response, so a shared instance would leak it.
+NO_JSON_DATA_BODY = dumps_json({'error': 'No JSON object provided'})
+
+def no_content_response():
+    """Build an empty 204 response for polls with nothing to hand out"""
+    return app.response_class(status=204)
+
+def no_json_data_response():
+    """Build the 400 response for requests without a JSON object body"""
+    return app.response_class(NO_JSON_DATA_BODY, status=400, mimetype='application/json')
+
+def is_not_modified(etag):
+    """Whether the client's If-None-Match already holds this (weak) ETag"""
+    return request.if_none_match.contains_weak(etag)
+
+def set_weak_etag(response, etag):
+    """Tag a polled response so clients revalidate it with If-None-Match"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified_response(etag):
+    """Build an empty 304 response for a poll whose data has not changed"""
+    return set_weak_etag(app.response_class(status=304), etag)
+
+def build_position_data(data, timestamp):
+    """Build the stored position record from a movement update payload"""
+    return {
+        'x': data.get('x', 0.0),
+        'y': data.get('y', 0.0),
+        'status': data.get('status', 'idle'),  # idle, moving, at_customer, at_depot
+        'route_id': data.get('route_id'),
+        'target_x': data.get('target_x'),
+        'target_y': data.get('target_y'),
+        'timestamp': timestamp
+    }
+
+def sse_event(event, payload):
+    """Format a Server-Sent Event with a JSON data line"""
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + dumps_json(payload) + b'\n\n'
+
+def loads_json(data):
+    """Parse JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def read_json_body():
+    """Parse the request body as a JSON object, returning None when it is empty or not an object"""
+    data = request.get_data(cache=False)
+    if not data:
+        return None
+    data = loads_json(data)
+    # Every endpoint expects an object - anything else is answered like a missing body
+    return data if isinstance(data, dict) else None
+
+def read_log_text(log_file, offset, end):
+    """Read bytes [offset, end) of a log file as text through a read-only memory map"""
+    if end <= offset:
+        # Nothing new - also avoids mapping an empty file, which mmap rejects
+        return ''
+    with open(log_file, 'rb') as f:
+        # Logs are read front to back once - ask for a larger readahead window,
+        # on the file and on the mapping (page faults follow madvise, not fadvise)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), offset, end - offset, os.POSIX_FADV_SEQUENTIAL)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            log_text = mm[offset:end].decode('utf-8', errors='replace')
+        # Drop the pages again so polling many different logs does not crowd the page cache
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), offset, end - offset, os.POSIX_FADV_DONTNEED)
+    return log_text
+
+def log_agent_name(log_file_name):
+    """Get the API agent name for a log file name
+    
+    MRA files: "MRA_conversations.log" -> "mra"
+    DA files: "DA-DA1_conversations.log" -> "DA1" (remove "DA-" prefix for API)
+    """
+    full_name = log_file_name[:-len(LOG_FILE_SUFFIX)]
+    if full_name == "MRA":
+        return "mra"
+    if full_name.startswith("DA-"):
+        return full_name[3:]
+    return full_name
+
+class LogListing:
+    """Conversation log files with their API entries, built once per directory scan"""
+    
+    def __init__(self, log_files):
+        self.log_files = log_files
+        # Entries served by /log
+        self.agents = []
+        # De-duplicated agent names served by /api/latest-logs
+        self.agent_names = []
+        for log_file_name in log_files:
+            agent_name = log_agent_name(log_file_name)
+            self.agents.append({
+                'name': agent_name,
+                'log_file': log_file_name,
+                'endpoint': f'/log/{agent_name}'
+            })
+            if agent_name not in self.agent_names:
+                self.agent_names.append(agent_name)
+        # Both listing payloads depend only on the file names
+        names = '\n'.join(log_files).encode('utf-8')
+        self.etag = f'{len(log_files):x}-{zlib.crc32(names):08x}'
+
+class LogBodyCache:
+    """Small LRU of encoded /log/<agent_name> bodies
+    
+    Entries are keyed by request (agent name, offset) and store the file version
+    (inode, st_mtime_ns, st_size) they were built from. A different version is a
+    miss and the new body replaces the old one, so each log holds at most one
+    entry per offset however often it is appended to.
+    """
+    
+    def __init__(self, maxsize, max_bytes):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, version, body):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            if len(body) > self.max_bytes:
+                # Larger than the whole cache - serve it uncached
+                return
+            self._entries[key] = (version, body)
+            self.total_bytes += len(body)
+            while len(self._entries) > self.maxsize or self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+REQUESTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    status TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    solution BLOB,
+    completed_at REAL,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_pending ON requests(timestamp) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_requests_processing ON requests(claimed_at) WHERE status = 'processing';
+CREATE INDEX IF NOT EXISTS idx_requests_completed ON requests(completed_at) WHERE status = 'completed';
+"""
 
 class CVRPBackendServer:
-    def __init__(self):
-        self.requests = {}
-        self.solutions = {}
+    def __init__(self, completed_ttl=COMPLETED_REQUEST_TTL_SECONDS, db_path=DB_PATH,
+                 processing_lease=PROCESSING_LEASE_SECONDS):
+        # Requests and solutions live in SQLite (WAL mode) so they survive restarts;
+        # statuses: pending, processing, completed. One server process owns the database,
+        # which is opened on first use so importing this module has no side effects on it.
+        self.completed_ttl = completed_ttl
+        self.processing_lease = processing_lease
+        self.db_path = db_path
+        self._db = None
+        # Guards the database connection, vehicle_positions, vehicle_config and agent_status
+        self._lock = threading.RLock()
+        # Signalled by add_request to wake long-polling MRA requests
+        self._request_added = threading.Condition(self._lock)
+        # Change feed for streaming clients: (seq, vehicle_name, position or None when removed)
+        self.movement_seq = 0
+        self.movement_changes = deque(maxlen=MOVEMENT_CHANGE_BUFFER)
+        self._movement_changed = threading.Condition(self._lock)
         self.registered_agents = set()  # Track registered agents for log endpoints
         # Use absolute path to logs directory relative to project root
         self.logs_base_dir = LOGS_DIR
+        # Created once here, which every entry point (script, WSGI server import) runs,
+        # instead of on every log request
+        self.logs_base_dir.mkdir(parents=True, exist_ok=True)
         # Movement tracking: {vehicle_name: {'x': float, 'y': float, 'status': str, 'route_id': str, 'timestamp': float}}
         self.vehicle_positions = {}
         # Vehicle configuration for agent creation
@@ -36,47 +261,285 @@ class CVRPBackendServer:
         # status: 'active', 'inactive', 'terminated'
         # type: 'mra', 'da'
         self.agent_status = {}
-        
+        # Serialized /api/agents/status body, rebuilt whenever agent_status changes
+        self.agent_status_body = self._build_agent_status_body()
+        # Encoded agent log responses for repeated polls of unchanged files
+        self.log_body_cache = LogBodyCache(LOG_BODY_CACHE_SIZE, LOG_BODY_CACHE_MAX_BYTES)
+        # Log directory listing cache: (checked at, directory st_mtime_ns or None if unsettled, LogListing)
+        self._log_list_cache = None
+        self._log_list_lock = threading.Lock()
+        
+    @property
+    def logs_base_dir_str(self):
+        """Plain string form of logs_base_dir for per-request path handling"""
+        return str(self.logs_base_dir)
+    
+    @property
+    def db(self):
+        """SQLite connection for the requests table, opened on first use"""
+        with self._lock:
+            if self._db is None:
+                db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                # Databases created before claims were leased lack the column
+                columns = [row[1] for row in db.execute('PRAGMA table_info(requests)')]
+                if columns and 'claimed_at' not in columns:
+                    db.execute('ALTER TABLE requests ADD COLUMN claimed_at REAL')
+                db.executescript(REQUESTS_SCHEMA)
+                self._db = db
+            return self._db
+    
+    def list_logs(self):
+        """List the conversation logs, rescanning only when the logs directory changes"""
+        cache = self._log_list_cache
+        if cache is not None and time.monotonic() - cache[0] < LOG_LIST_TTL_SECONDS:
+            return cache[2]
+        
+        with self._log_list_lock:
+            # A burst of concurrent polls refreshes the listing once - the rest reuse it
+            cache = self._log_list_cache
+            checked_at = time.monotonic()
+            if cache is not None and checked_at - cache[0] < LOG_LIST_TTL_SECONDS:
+                return cache[2]
+            
+            mtime_ns = os.stat(self.logs_base_dir).st_mtime_ns
+            if cache is not None and cache[1] == mtime_ns:
+                listing = cache[2]
+            else:
+                with os.scandir(self.logs_base_dir) as entries:
+                    listing = LogListing([entry.name for entry in entries if entry.name.endswith(LOG_FILE_SUFFIX)])
+                # A file created in the same mtime tick would be missed, so an unsettled
+                # listing is only trusted until the TTL runs out
+                if time.time_ns() - mtime_ns <= LOG_LIST_SETTLE_NS:
+                    mtime_ns = None
+            self._log_list_cache = (checked_at, mtime_ns, listing)
+        return listing
+    
     def add_request(self, request_data):
         """Add a new CVRP request"""
         request_id = str(uuid.uuid4())
-        self.requests[request_id] = {
-            'data': request_data,
-            'status': 'pending',
-            'timestamp': time.time()
-        }
+        with self._lock:
+            self._evict_expired()
+            self.db.execute(
+                "INSERT INTO requests (id, data, status, timestamp) VALUES (?, ?, 'pending', ?)",
+                (request_id, dumps_json(request_data), time.time())
+            )
+            self._request_added.notify_all()
         print(f"Added new CVRP request: {request_id}")
         return request_id
     
-    def get_pending_request(self):
-        """Get the oldest pending request"""
-        for req_id, req_data in self.requests.items():
-            if req_data['status'] == 'pending':
-                # Create a copy to avoid mutating original
-                req_data_copy = req_data.copy()
-                req_data_copy['status'] = 'processing'
-                req_data['status'] = 'processing'
-                print(f"Returning pending request: {req_id}")
-                return req_id, req_data['data']
-        return None, None
+    def get_pending_request(self, wait=0):
+        """Get the oldest pending request, waiting up to `wait` seconds for one to arrive"""
+        deadline = time.monotonic() + wait
+        with self._request_added:
+            req_id, req_data = self._claim_pending_request()
+            while req_id is None:
+                remaining = deadline - time.monotonic()
+                if not remaining > 0:
+                    break
+                self._request_added.wait(remaining)
+                req_id, req_data = self._claim_pending_request()
+        if req_id is None:
+            return None, None
+        print(f"Returning pending request: {req_id}")
+        return req_id, loads_json(req_data)
+    
+    def _claim_pending_request(self):
+        """Mark the oldest pending request as processing and return (id, data blob)
+        
+        A processing request whose lease has run out (the MRA stopped, or the backend
+        restarted before its solution arrived) is claimed again once nothing is pending.
+        """
+        with self._lock:
+            db = self.db
+            now = time.time()
+            # IMMEDIATE takes the write lock up front so the select and update form one claim
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute(
+                    "SELECT id, data FROM requests WHERE status = 'pending' ORDER BY timestamp LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    row = db.execute(
+                        "SELECT id, data FROM requests WHERE status = 'processing' "
+                        "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY claimed_at LIMIT 1",
+                        (now - self.processing_lease,)
+                    ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE requests SET status = 'processing', claimed_at = ? WHERE id = ?",
+                        (now, row[0])
+                    )
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None, None
+        return row
     
     def add_solution(self, request_id, solution_data):
         """Add a solution for a request"""
-        if request_id in self.requests:
-            self.requests[request_id]['status'] = 'completed'
-            self.solutions[request_id] = {
-                'solution': solution_data,
-                'timestamp': time.time()
-            }
-            print(f"Added solution for request: {request_id}")
-            return True
-        return False
+        with self._lock:
+            updated = self.db.execute(
+                "UPDATE requests SET status = 'completed', solution = ?, "
+                "completed_at = COALESCE(completed_at, ?) WHERE id = ?",
+                (dumps_json(solution_data), time.time(), request_id)
+            ).rowcount
+            if not updated:
+                return False
+            self._evict_expired()
+        print(f"Added solution for request: {request_id}")
+        return True
+    
+    def _evict_expired(self):
+        """Drop completed requests and solutions older than the TTL (caller holds the lock)"""
+        self.db.execute(
+            "DELETE FROM requests WHERE status = 'completed' AND completed_at < ?",
+            (time.time() - self.completed_ttl,)
+        )
     
     def get_solution(self, request_id):
         """Get solution for a request"""
-        if request_id in self.solutions:
-            return self.solutions[request_id]['solution']
-        return None
+        return self.get_request_status(request_id)[1]
+    
+    def get_request_status(self, request_id):
+        """Get (status, solution) for a request, or (None, None) if it is unknown"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT status, solution FROM requests WHERE id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        status, solution = row
+        return status, loads_json(solution) if solution is not None else None
+    
+    def update_vehicle_position(self, vehicle_name, position_data):
+        """Store the latest position reported for a vehicle"""
+        self.update_vehicle_positions([(vehicle_name, position_data)])
+    
+    def update_vehicle_positions(self, updates):
+        """Store a batch of (vehicle_name, position_data) updates in one critical section"""
+        with self._lock:
+            for vehicle_name, position_data in updates:
+                self.vehicle_positions[vehicle_name] = position_data
+                self._record_movement(vehicle_name, position_data)
+    
+    def _record_movement(self, vehicle_name, position_data):
+        """Append a change to the movement feed and wake stream clients (caller holds the lock)"""
+        self.movement_seq += 1
+        self.movement_changes.append((self.movement_seq, vehicle_name, position_data))
+        self._movement_changed.notify_all()
+    
+    def get_movement_snapshot(self):
+        """Get (seq, positions) so a stream client can follow changes made after the snapshot"""
+        with self._lock:
+            return self.movement_seq, dict(self.vehicle_positions)
+    
+    def wait_for_movement_changes(self, since_seq, timeout):
+        """Wait up to timeout for position changes after since_seq
+        
+        Returns (seq, changes) where changes maps vehicle name to its latest position
+        (None if removed). changes is None when since_seq is older than the change
+        buffer and the caller has to start again from a snapshot.
+        """
+        with self._movement_changed:
+            self._movement_changed.wait_for(lambda: self.movement_seq != since_seq, timeout)
+            if self.movement_seq == since_seq:
+                return since_seq, {}
+            if not self.movement_changes or self.movement_changes[0][0] > since_seq + 1:
+                return self.movement_seq, None
+            changes = {name: position for seq, name, position in self.movement_changes if seq > since_seq}
+            return self.movement_seq, changes
+    
+    def get_vehicle_positions(self):
+        """Get a snapshot of all vehicle positions"""
+        with self._lock:
+            return dict(self.vehicle_positions)
+    
+    def get_vehicle_position(self, vehicle_name):
+        """Get position for a vehicle, or None if it is not tracked"""
+        with self._lock:
+            return self.vehicle_positions.get(vehicle_name)
+    
+    def set_vehicle_config(self, vehicles, depot):
+        """Store a confirmed vehicle configuration for Main.java to pick up"""
+        with self._lock:
+            self.vehicle_config = {
+                'vehicles': vehicles,
+                'depot': depot
+            }
+            self.vehicle_config_timestamp = time.time()
+    
+    def consume_vehicle_config(self):
+        """Get the pending vehicle configuration and clear it (one-time use)"""
+        with self._lock:
+            config = self.vehicle_config
+            self.vehicle_config = None
+            return config, self.vehicle_config_timestamp
+    
+    def update_agent_status(self, agent_name, agent_type, status, info):
+        """Record an agent status change, dropping the vehicle position of terminated DAs"""
+        removed_vehicles = []
+        with self._lock:
+            self.agent_status[agent_name] = {
+                'status': status,
+                'type': agent_type,
+                'timestamp': time.time(),
+                'info': info
+            }
+            
+            # If agent is terminated, remove its vehicle position from tracking
+            # This ensures terminated DA icons disappear from the frontend map
+            if status == 'terminated' and agent_type == 'da':
+                # Remove vehicle position if it exists (using agent_name as vehicle_name)
+                # Also check for any vehicle positions with similar names (in case of naming mismatches)
+                # This handles cases where vehicle_name might have suffixes or prefixes
+                removed_vehicles = [vname for vname in self.vehicle_positions
+                                    if vname == agent_name or vname.startswith(agent_name + '-')
+                                    or agent_name.startswith(vname + '-')]
+                for vname in removed_vehicles:
+                    del self.vehicle_positions[vname]
+                    self._record_movement(vname, None)
+            
+            self.agent_status_body = self._build_agent_status_body()
+        
+        for vname in removed_vehicles:
+            print(f"Removed vehicle position for terminated DA: {vname}")
+    
+    def _build_agent_status_body(self):
+        """Serialize the /api/agents/status payload (caller holds the lock)"""
+        agents = []
+        mra_count = da_count = total_active = 0
+        for agent_name, agent_info in self.agent_status.items():
+            agent_data = {
+                'name': agent_name,
+                'type': agent_info['type'],
+                'status': agent_info['status'],
+                'timestamp': agent_info['timestamp']
+            }
+            # Add additional info if available
+            if agent_info.get('info'):
+                agent_data['info'] = agent_info['info']
+            agents.append(agent_data)
+            
+            if agent_info['status'] == 'active':
+                total_active += 1
+                if agent_info['type'] == 'mra':
+                    mra_count += 1
+                elif agent_info['type'] == 'da':
+                    da_count += 1
+        
+        # Sort: MRA first, then DAs
+        agents.sort(key=lambda x: (x['type'] != 'mra', x['name']))
+        
+        return dumps_json({
+            'agents': agents,
+            'mra_count': mra_count,
+            'da_count': da_count,
+            'total_active': total_active
+        })
 
 # Global server instance
 server = CVRPBackendServer()
@@ -87,17 +550,19 @@ def poll_request():
     action = request.args.get('action', 'poll')
     
     if action == 'poll':
-        # Return pending request if available
-        req_id, req_data = server.get_pending_request()
+        # Return pending request if available; ?wait=<seconds> holds the request
+        # open until one arrives instead of answering 204 immediately
+        wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_POLL_WAIT_SECONDS)
+        req_id, req_data = server.get_pending_request(wait)
         if req_id and req_data:
-            return jsonify({
+            return json_response({
                 'request_id': req_id,
                 'data': req_data
-            }), 200
+            })
         else:
-            return '', 204  # No Content - no pending requests
+            return no_content_response()  # No Content - no pending requests
     else:
-        return jsonify({'error': 'Invalid action'}), 400
+        return json_response({'error': 'Invalid action'}, 400)
 
 @app.route('/api/solve-cvrp', methods=['POST'])
 def submit_solution():
@@ -108,78 +573,76 @@ def submit_solution():
     if action == 'response':
         # This is a solution from the Depot agent
         try:
-            solution_data = request.get_json()
+            solution_data = read_json_body()
             if not solution_data:
-                return jsonify({'error': 'No JSON data provided'}), 400
+                return no_json_data_response()
                 
             request_id = solution_data.get('request_id')
             
             if not request_id:
-                return jsonify({'error': 'Missing request_id'}), 400
+                return json_response({'error': 'Missing request_id'}, 400)
             
             # Add the solution to the server
             success = server.add_solution(request_id, solution_data)
             
             if success:
-                return jsonify({'status': 'success', 'message': 'Solution received'}), 200
+                return json_response({'status': 'success', 'message': 'Solution received'})
             else:
-                return jsonify({'error': 'Invalid request_id'}), 400
+                return json_response({'error': 'Invalid request_id'}, 400)
                 
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}, 500)
     else:
         # This is a new CVRP request from the frontend
         try:
-            cvrp_data = request.get_json()
+            cvrp_data = read_json_body()
             if not cvrp_data:
-                return jsonify({'error': 'No JSON data provided'}), 400
+                return no_json_data_response()
                 
             # Validate required fields - only customers are required
             # Depot and vehicles are NOT in requests - they are set when vehicles are confirmed
             if 'customers' not in cvrp_data or not isinstance(cvrp_data['customers'], list):
-                return jsonify({'error': 'Missing or invalid field: customers (must be array)'}), 400
+                return json_response({'error': 'Missing or invalid field: customers (must be array)'}, 400)
             
             # Validate customers structure
             for i, customer in enumerate(cvrp_data['customers']):
                 if 'id' not in customer or 'demand' not in customer or 'x' not in customer or 'y' not in customer:
-                    return jsonify({'error': f'Customer {i} must have: id, demand, x, y'}), 400
+                    return json_response({'error': f'Customer {i} must have: id, demand, x, y'}, 400)
             
             print(f"Received CVRP request from frontend: {len(cvrp_data['customers'])} customers (using existing DAs)")
             request_id = server.add_request(cvrp_data)
             
             # Return immediately with request_id for polling
-            return jsonify({
+            return json_response({
                 'request_id': request_id,
                 'status': 'submitted',
                 'message': 'Request submitted successfully. Use polling to check for solution.'
-            }), 202  # Accepted status
+            }, 202)  # Accepted status
             
         except Exception as e:
             print(f"Error processing frontend request: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+            return json_response({'error': str(e)}, 500)
 
 @app.route('/api/solution/<request_id>', methods=['GET'])
 def get_solution_status(request_id):
     """Check solution status for a request"""
     try:
-        if request_id in server.requests:
-            request_info = server.requests[request_id]
-            if request_id in server.solutions:
-                solution = server.get_solution(request_id)
-                return jsonify({
-                    'request_id': request_id,
-                    'status': 'completed',
-                    'solution': solution
-                }), 200
-            else:
-                return jsonify({
-                    'request_id': request_id,
-                    'status': request_info['status']
-                }), 200
+        status, solution = server.get_request_status(request_id)
+        if status is None:
+            return json_response({'error': 'Request not found'}, 404)
+        if status == 'completed':
+            return json_response({
+                'request_id': request_id,
+                'status': 'completed',
+                'solution': solution
+            })
         else:
-            return jsonify({'error': 'Request not found'}), 404
+            return json_response({
+                'request_id': request_id,
+                'status': status
+            })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/log/mra', methods=['GET'])
 def get_mra_log():
@@ -193,20 +656,10 @@ def get_agent_log(agent_name=None):
         agent_name = request.view_args.get('agent_name')
     
     if not agent_name:
-        return jsonify({'error': 'Agent name required'}), 400
+        return json_response({'error': 'Agent name required'}, 400)
     
     try:
-        # Logs are now directly in logs/ folder (no subfolders)
-        # Create logs directory if it doesn't exist
-        server.logs_base_dir.mkdir(parents=True, exist_ok=True)
-        
-        if not server.logs_base_dir.exists():
-            return jsonify({
-                'error': 'Logs directory not found',
-                'path': str(server.logs_base_dir),
-                'absolute_path': str(server.logs_base_dir.absolute())
-            }), 404
-        
+        # Logs are directly in logs/ folder (no subfolders), created at server startup
         # Determine log file name based on actual file structure
         # MRA log file: "MRA_conversations.log"
         # DA log files: "DA-{agent_name}_conversations.log" (e.g., "DA-DA1_conversations.log")
@@ -225,130 +678,197 @@ def get_agent_log(agent_name=None):
                 log_file_name = f"DA-{agent_name}_conversations.log"
         
         # Look for log file directly in logs/ folder
-        log_file = server.logs_base_dir / log_file_name
+        log_file = os.path.join(server.logs_base_dir_str, log_file_name)
         
-        if not log_file.exists():
+        # Size at request time; clients pass it back as ?offset= (or a Range header with
+        # ?raw=1) on their next poll so only newly appended bytes are transferred
+        try:
+            log_stat = os.stat(log_file)
+        except FileNotFoundError:
             # List available log files for debugging
-            available_files = [f.name for f in server.logs_base_dir.glob("*_conversations.log")] if server.logs_base_dir.exists() else []
-            return jsonify({
+            try:
+                available_files = server.list_logs().log_files
+            except FileNotFoundError:
+                available_files = []
+            return json_response({
                 'error': f'Log file not found for agent: {agent_name}',
                 'searched_file': log_file_name,
-                'searched_path': str(log_file),
-                'logs_directory': str(server.logs_base_dir),
+                'searched_path': log_file,
+                'logs_directory': server.logs_base_dir_str,
                 'available_files': available_files,
                 'message': 'Log file may not exist yet. Agents create log files when they start processing requests.'
-            }), 404
-        
-        # Read and return log file content
-        with open(log_file, 'r', encoding='utf-8') as f:
-            log_content = f.read()
+            }, 404)
+        log_size = log_stat.st_size
+        
+        # ?raw=1 streams the file itself as text/plain instead of embedding it in JSON
+        if request.args.get('raw') == '1':
+            response = send_file(log_file, mimetype='text/plain', conditional=True)
+            response.headers['X-Log-Size'] = str(log_size)
+            return response
+        
+        # Same file, mtime and size as the client's last poll of this URL - nothing to send
+        etag = f'{log_stat.st_ino:x}-{log_stat.st_mtime_ns:x}-{log_size:x}'
+        if is_not_modified(etag):
+            response = not_modified_response(etag)
+            response.headers['X-Log-Size'] = str(log_size)
+            return response
+        
+        offset = request.args.get('offset', 0, type=int)
+        if offset < 0 or offset > log_size:
+            # Log was truncated or recreated - send it again from the start
+            offset = 0
+        
+        # Unchanged file and same request - reuse the body encoded for an earlier poll
+        cache_key = (agent_name, offset)
+        log_version = (log_stat.st_ino, log_stat.st_mtime_ns, log_size)
+        body = server.log_body_cache.get(cache_key, log_version)
+        if body is None:
+            # Read log file content from the requested offset
+            log_content = read_log_text(log_file, offset, log_size)
+            body = dumps_json({
+                'agent_name': agent_name,
+                'log_file': log_file_name,
+                'content': log_content,
+                'size': len(log_content),
+                'offset': offset,
+                'next_offset': log_size
+            })
+            server.log_body_cache.put(cache_key, log_version, body)
         
-        return jsonify({
-            'agent_name': agent_name,
-            'log_file': str(log_file.relative_to(server.logs_base_dir)),
-            'content': log_content,
-            'size': len(log_content)
-        }), 200
+        response = app.response_class(body, mimetype='application/json')
+        response.headers['X-Log-Size'] = str(log_size)
+        return set_weak_etag(response, etag)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/api/movement/update', methods=['POST'])
 def update_vehicle_position():
     """Update vehicle position (called by agents or parsed from logs)"""
     try:
-        data = request.get_json()
+        data = read_json_body()
         if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
+            return no_json_data_response()
         
         vehicle_name = data.get('vehicle_name')
         if not vehicle_name:
-            return jsonify({'error': 'vehicle_name required'}), 400
+            return json_response({'error': 'vehicle_name required'}, 400)
+        
+        server.update_vehicle_position(vehicle_name, build_position_data(data, time.time()))
+        return json_response({'success': True, 'vehicle': vehicle_name})
+        
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/movement/update-batch', methods=['POST'])
+def update_vehicle_positions():
+    """Update several vehicle positions in one request"""
+    try:
+        data = read_json_body()
+        if not data:
+            return no_json_data_response()
+        
+        updates = data.get('updates')
+        if not isinstance(updates, list):
+            return json_response({'error': 'updates must be an array'}, 400)
         
-        position_data = {
-            'x': data.get('x', 0.0),
-            'y': data.get('y', 0.0),
-            'status': data.get('status', 'idle'),  # idle, moving, at_customer, at_depot
-            'route_id': data.get('route_id'),
-            'target_x': data.get('target_x'),
-            'target_y': data.get('target_y'),
-            'timestamp': time.time()
-        }
+        now = time.time()
+        positions = []
+        for i, update in enumerate(updates):
+            vehicle_name = update.get('vehicle_name') if isinstance(update, dict) else None
+            if not vehicle_name:
+                return json_response({'error': f'Update {i} must have: vehicle_name'}, 400)
+            positions.append((vehicle_name, build_position_data(update, now)))
         
-        server.vehicle_positions[vehicle_name] = position_data
-        return jsonify({'success': True, 'vehicle': vehicle_name}), 200
+        server.update_vehicle_positions(positions)
+        return json_response({'success': True, 'updated': len(positions)})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/api/movement/all', methods=['GET'])
 def get_all_vehicle_positions():
     """Get all vehicle positions"""
-    return jsonify({
-        'vehicles': server.vehicle_positions,
+    return json_response({
+        'vehicles': server.get_vehicle_positions(),
         'timestamp': time.time()
-    }), 200
+    })
+
+@app.route('/api/movement/stream', methods=['GET'])
+def stream_vehicle_positions():
+    """Stream vehicle position changes as Server-Sent Events"""
+    def generate():
+        # Start with the full picture, then send only the vehicles that changed
+        seq, vehicles = server.get_movement_snapshot()
+        yield sse_event('snapshot', {'vehicles': vehicles, 'timestamp': time.time()})
+        while True:
+            seq, changes = server.wait_for_movement_changes(seq, MOVEMENT_STREAM_KEEPALIVE_SECONDS)
+            if changes is None:
+                # Client fell behind the change buffer - resend everything
+                seq, vehicles = server.get_movement_snapshot()
+                yield sse_event('snapshot', {'vehicles': vehicles, 'timestamp': time.time()})
+            elif changes:
+                yield sse_event('update', {'vehicles': changes, 'timestamp': time.time()})
+            else:
+                yield b': keepalive\n\n'
+    
+    return app.response_class(generate(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache'})
 
 @app.route('/api/vehicles/confirm', methods=['POST'])
 def confirm_vehicles():
     """Confirm vehicle list and trigger agent creation"""
     try:
-        data = request.get_json()
+        data = read_json_body()
         if not data or 'vehicles' not in data:
-            return jsonify({'error': 'Invalid request - vehicles required'}), 400
+            return json_response({'error': 'Invalid request - vehicles required'}, 400)
         
         vehicles = data['vehicles']
         if not isinstance(vehicles, list) or len(vehicles) == 0:
-            return jsonify({'error': 'At least one vehicle required'}), 400
+            return json_response({'error': 'At least one vehicle required'}, 400)
         
         # Validate vehicle data
         for v in vehicles:
             if 'name' not in v or 'capacity' not in v or 'maxDistance' not in v:
-                return jsonify({'error': 'Each vehicle must have: name, capacity, maxDistance'}), 400
+                return json_response({'error': 'Each vehicle must have: name, capacity, maxDistance'}, 400)
         
         # Store vehicle configuration
-        server.vehicle_config = {
-            'vehicles': vehicles,
-            'depot': data.get('depot', {'name': 'Depot', 'x': 0.0, 'y': 0.0})
-        }
-        server.vehicle_config_timestamp = time.time()
+        server.set_vehicle_config(vehicles, data.get('depot', {'name': 'Depot', 'x': 0.0, 'y': 0.0}))
         
         print(f"Vehicle configuration confirmed: {len(vehicles)} vehicles")
         for v in vehicles:
             print(f"  - {v['name']}: capacity={v['capacity']}, maxDistance={v['maxDistance']}")
         
-        return jsonify({
+        return json_response({
             'success': True,
             'message': f'{len(vehicles)} vehicles confirmed. Agents will be created.',
             'vehicles': [v['name'] for v in vehicles]
-        }), 200
+        })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/api/vehicles/poll-config', methods=['GET'])
 def poll_vehicle_config():
     """Poll endpoint for Main.java to get vehicle configuration and create agents"""
-    if server.vehicle_config is None:
-        return '', 204  # No Content - no vehicle config available
-    
     # Return config and mark as consumed (Main.java will create agents)
-    config = server.vehicle_config.copy()
-    server.vehicle_config = None  # Consume the config (one-time use)
+    config, config_timestamp = server.consume_vehicle_config()
+    if config is None:
+        return no_content_response()  # No Content - no vehicle config available
     
-    return jsonify({
+    return json_response({
         'vehicles': config['vehicles'],
         'depot': config['depot'],
-        'timestamp': server.vehicle_config_timestamp
-    }), 200
+        'timestamp': config_timestamp
+    })
 
 @app.route('/api/agents/status', methods=['POST'])
 def update_agent_status():
     """Update agent status (called by agents when they start/stop)"""
     try:
-        data = request.get_json()
+        data = read_json_body()
         if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
+            return no_json_data_response()
         
         agent_name = data.get('agent_name')
         agent_type = data.get('agent_type')  # 'mra' or 'da'
@@ -356,171 +876,71 @@ def update_agent_status():
         info = data.get('info', {})  # Additional info (depot coords for MRA, capacity/speed for DA)
         
         if not agent_name or not agent_type or not status:
-            return jsonify({'error': 'agent_name, agent_type, and status required'}), 400
-        
-        server.agent_status[agent_name] = {
-            'status': status,
-            'type': agent_type,
-            'timestamp': time.time(),
-            'info': info
-        }
-        
-        # If agent is terminated, remove its vehicle position from tracking
-        # This ensures terminated DA icons disappear from the frontend map
-        if status == 'terminated' and agent_type == 'da':
-            # Remove vehicle position if it exists (using agent_name as vehicle_name)
-            if agent_name in server.vehicle_positions:
-                del server.vehicle_positions[agent_name]
-                print(f"Removed vehicle position for terminated DA: {agent_name}")
-            # Also check for any vehicle positions with similar names (in case of naming mismatches)
-            # This handles cases where vehicle_name might have suffixes or prefixes
-            vehicles_to_remove = [vname for vname in server.vehicle_positions.keys() 
-                                 if vname != agent_name and (vname.startswith(agent_name + '-') 
-                                 or agent_name.startswith(vname + '-'))]
-            for vname in vehicles_to_remove:
-                del server.vehicle_positions[vname]
-                print(f"Removed vehicle position for terminated DA (matched): {vname}")
+            return json_response({'error': 'agent_name, agent_type, and status required'}, 400)
+        
+        server.update_agent_status(agent_name, agent_type, status, info)
         
         print(f"Agent status updated: {agent_name} ({agent_type}) -> {status}")
-        return jsonify({'success': True, 'agent': agent_name}), 200
+        return json_response({'success': True, 'agent': agent_name})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/api/agents/status', methods=['GET'])
 def get_agent_status():
-    """Get current status of all agents"""
-    agents = []
-    for agent_name, agent_info in server.agent_status.items():
-        agent_data = {
-            'name': agent_name,
-            'type': agent_info['type'],
-            'status': agent_info['status'],
-            'timestamp': agent_info['timestamp']
-        }
-        # Add additional info if available
-        if 'info' in agent_info and agent_info['info']:
-            agent_data['info'] = agent_info['info']
-        agents.append(agent_data)
-    
-    # Sort: MRA first, then DAs
-    agents.sort(key=lambda x: (x['type'] != 'mra', x['name']))
-    
-    return jsonify({
-        'agents': agents,
-        'mra_count': sum(1 for a in agents if a['type'] == 'mra' and a['status'] == 'active'),
-        'da_count': sum(1 for a in agents if a['type'] == 'da' and a['status'] == 'active'),
-        'total_active': sum(1 for a in agents if a['status'] == 'active')
-    }), 200
+    """Get current status of all agents (body is prepared on each status update)"""
+    return app.response_class(server.agent_status_body, mimetype='application/json')
 
 @app.route('/api/movement/<vehicle_name>', methods=['GET'])
 def get_vehicle_position(vehicle_name):
     """Get position for a specific vehicle"""
-    if vehicle_name in server.vehicle_positions:
-        return jsonify({
+    position = server.get_vehicle_position(vehicle_name)
+    if position is not None:
+        return json_response({
             'vehicle': vehicle_name,
-            'position': server.vehicle_positions[vehicle_name]
-        }), 200
+            'position': position
+        })
     else:
-        return jsonify({'error': 'Vehicle not found'}), 404
+        return json_response({'error': 'Vehicle not found'}, 404)
 
 @app.route('/log', methods=['GET'])
 def list_available_logs():
     """List all available agent logs"""
     try:
-        # Create logs directory if it doesn't exist
-        server.logs_base_dir.mkdir(parents=True, exist_ok=True)
-        
-        if not server.logs_base_dir.exists():
-            return jsonify({'agents': []}), 200
-        
-        agents = []
-        
-        # Find all log files directly in logs/ folder
-        for log_file in server.logs_base_dir.glob("*_conversations.log"):
-            full_name = log_file.stem.replace("_conversations", "")
-            
-            # Extract agent name for API access
-            # MRA files: "MRA" -> agent_name = "mra"
-            # DA files: "DA-DA1" -> agent_name = "DA1" (remove "DA-" prefix for API)
-            if full_name == "MRA":
-                agent_name = "mra"
-            elif full_name.startswith("DA-"):
-                # Remove "DA-" prefix for API access (e.g., "DA-DA1" -> "DA1")
-                agent_name = full_name[3:]
-            else:
-                agent_name = full_name
-            
-            agents.append({
-                'name': agent_name,
-                'log_file': str(log_file.name),
-                'endpoint': f'/log/{agent_name}'
-            })
-        
-        # Always include MRA if file exists
-        if 'mra' not in [a['name'] for a in agents] and (server.logs_base_dir / "MRA_conversations.log").exists():
-            agents.append({
-                'name': 'mra',
-                'log_file': 'MRA_conversations.log',
-                'endpoint': '/log/mra'
-            })
-        
-        return jsonify({'agents': agents}), 200
-        
+        listing = server.list_logs()
+        if is_not_modified(listing.etag):
+            return not_modified_response(listing.etag)
+        return set_weak_etag(json_response({'agents': listing.agents}), listing.etag)
+        
+    except FileNotFoundError:
+        # Logs directory removed while the server is running
+        return json_response({'agents': []})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/api/latest-logs', methods=['GET'])
 def get_latest_logs():
     """Get latest logs info (for frontend compatibility)"""
     try:
-        # Create logs directory if it doesn't exist
-        server.logs_base_dir.mkdir(parents=True, exist_ok=True)
-        
-        if not server.logs_base_dir.exists():
-            return jsonify({'agents': [], 'folder': None}), 200
-        
-        agents = []
-        
-        # Find all log files directly in logs/ folder
-        for log_file in server.logs_base_dir.glob("*_conversations.log"):
-            full_name = log_file.stem.replace("_conversations", "")
-            
-            # Extract agent name for API access
-            # MRA files: "MRA" -> agent_name = "mra"
-            # DA files: "DA-DA1" -> agent_name = "DA1" (remove "DA-" prefix for API)
-            if full_name == "MRA":
-                agent_name = "mra"
-            elif full_name.startswith("DA-"):
-                # Remove "DA-" prefix for API access (e.g., "DA-DA1" -> "DA1")
-                agent_name = full_name[3:]
-            else:
-                agent_name = full_name
-            
-            if agent_name not in agents:
-                agents.append(agent_name)
-        
-        # Always include MRA if file exists
-        if 'mra' not in agents and (server.logs_base_dir / "MRA_conversations.log").exists():
-            agents.append('mra')
-        
-        return jsonify({
-            'agents': agents,
+        listing = server.list_logs()
+        if is_not_modified(listing.etag):
+            return not_modified_response(listing.etag)
+        return set_weak_etag(json_response({
+            'agents': listing.agent_names,
             'folder': None  # No folder structure anymore
-        }), 200
+        }), listing.etag)
         
+    except FileNotFoundError:
+        # Logs directory removed while the server is running
+        return json_response({'agents': [], 'folder': None})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
             
 def start_backend_server(host='localhost', port=8000, debug=False):
     print(f"Starting CVRP Backend Server on {host}:{port}")
-    print(f"Logs directory: {LOGS_DIR}")
-    print(f"Logs directory exists: {LOGS_DIR.exists()}")
-    if LOGS_DIR.exists():
-        log_files = list(LOGS_DIR.glob("*_conversations.log"))
-        print(f"Found {len(log_files)} log files: {[f.name for f in log_files]}")
-    else:
-        print("Logs directory does not exist yet - will be created when needed")
+    print(f"Logs directory: {server.logs_base_dir}")
+    log_files = server.list_logs().log_files
+    print(f"Found {len(log_files)} log files: {log_files}")
     print("Available endpoints:")
     print("  GET  /api/solve-cvrp?action=poll     - Poll for pending requests")
     print("  POST /api/solve-cvrp?action=response - Submit solution")
@@ -529,7 +949,16 @@ def start_backend_server(host='localhost', port=8000, debug=False):
     print("  GET  /log/mra                        - Get MRA log")
     print("  GET  /log/<agent_name>               - Get agent log")
     print("  GET  /log                            - List available agent logs")
-    app.run(host=host, port=port, debug=debug, use_reloader=False)
+    print("  POST /api/movement/update-batch      - Update several vehicle positions")
+    print("  GET  /api/movement/stream            - Stream vehicle position changes (SSE)")
+    if os.environ.get('CVRP_PRODUCTION') == '1':
+        # Multi-threaded production WSGI server. Keep it to one process: vehicle
+        # positions, agent status and stream subscribers live in this process
+        from waitress import serve
+        print(f"Serving with waitress ({SERVER_THREADS} threads)")
+        serve(app, host=host, port=port, threads=SERVER_THREADS)
+    else:
+        app.run(host=host, port=port, debug=debug, use_reloader=False)
 
 if __name__ == '__main__':
-    start_backend_server(debug=True)
+    start_backend_server(debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -9,11 +9,16 @@ Provides a web interface for:
 - Real-time vehicle movement tracking
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 from flask_cors import CORS
 import json
+import os
 import requests
+from requests.adapters import HTTPAdapter
+import secrets
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
 
 app = Flask(__name__)
@@ -23,17 +28,83 @@ CORS(app)
 # Backend API URL
 BACKEND_API = "http://localhost:8000"
 
-# Store vehicles in session (in production, use database)
-# Format: {name: {capacity, maxDistance}}
+# Shared HTTP session so backend calls reuse keep-alive connections instead of
+# opening a new TCP connection on every proxied poll
+BACKEND_SESSION = requests.Session()
+BACKEND_SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+
+# Worker threads for the production WSGI server - each open movement stream holds one
+SERVER_THREADS = 32
+
+# Validator headers passed through so browsers can revalidate polled logs with the backend
+CONDITIONAL_RESPONSE_HEADERS = ('ETag', 'Cache-Control', 'X-Log-Size')
+
+def proxy_response(response):
+    """Pass a backend response body through unchanged, keeping its status and Content-Type"""
+    proxied = app.response_class(
+        response.content,
+        status=response.status_code,
+        content_type=response.headers.get('Content-Type', 'application/json')
+    )
+    for header in CONDITIONAL_RESPONSE_HEADERS:
+        if header in response.headers:
+            proxied.headers[header] = response.headers[header]
+    return proxied
+
+def conditional_request_headers():
+    """Forward the browser's If-None-Match so the backend can answer 304 Not Modified"""
+    if_none_match = request.headers.get('If-None-Match')
+    return {'If-None-Match': if_none_match} if if_none_match else None
+
+# Browser sessions unused for this long lose their vehicle definitions
+VEHICLE_SESSION_TTL_SECONDS = 24 * 3600
+# Upper bound on stored sessions - the least recently used are dropped first
+MAX_VEHICLE_SESSIONS = 1000
+
+# Vehicles per browser session, kept in this process so the session cookie
+# only carries a short id instead of the whole vehicle list (in production, use database)
+# Format: {sid: (last access, {name: {capacity, maxDistance}})}, least recently used first
+VEHICLES_BY_SID = OrderedDict()
+VEHICLES_LOCK = threading.Lock()
+
+def copy_vehicles(vehicles):
+    return {name: dict(v) for name, v in vehicles.items()}
+
+def evict_vehicle_sessions(now):
+    """Drop expired sessions and trim to MAX_VEHICLE_SESSIONS (caller holds VEHICLES_LOCK)"""
+    while VEHICLES_BY_SID:
+        sid, (last_access, _) = next(iter(VEHICLES_BY_SID.items()))
+        if now - last_access < VEHICLE_SESSION_TTL_SECONDS and len(VEHICLES_BY_SID) <= MAX_VEHICLE_SESSIONS:
+            break
+        del VEHICLES_BY_SID[sid]
+
 def get_vehicles_from_session():
-    if 'vehicles' not in session:
-        session['vehicles'] = {}
-    return session['vehicles']
+    sid = session.get('sid')
+    if sid is None:
+        return {}
+    now = time.time()
+    with VEHICLES_LOCK:
+        evict_vehicle_sessions(now)
+        entry = VEHICLES_BY_SID.get(sid)
+        if entry is None:
+            return {}
+        VEHICLES_BY_SID[sid] = (now, entry[1])
+        VEHICLES_BY_SID.move_to_end(sid)
+        return copy_vehicles(entry[1])
+
+def save_vehicles_to_session(vehicles):
+    if 'sid' not in session:
+        session['sid'] = secrets.token_urlsafe(16)
+    now = time.time()
+    with VEHICLES_LOCK:
+        VEHICLES_BY_SID[session['sid']] = (now, copy_vehicles(vehicles))
+        VEHICLES_BY_SID.move_to_end(session['sid'])
+        evict_vehicle_sessions(now)
 
 @app.route('/')
 def index():
     """Main page - redirects to vehicle setup if no vehicles defined"""
-    if not session.get('vehicles'):
+    if not get_vehicles_from_session():
         return render_template('vehicles.html')
     return render_template('main.html')
 
@@ -73,7 +144,7 @@ def set_vehicles():
                 'maxDistance': float(v['maxDistance'])
             }
         
-        session['vehicles'] = vehicles
+        save_vehicles_to_session(vehicles)
         
         # Send vehicle list to backend API to create agents immediately
         try:
@@ -93,7 +164,7 @@ def set_vehicles():
                 }
             }
             
-            response = requests.post(
+            response = BACKEND_SESSION.post(
                 f"{BACKEND_API}/api/vehicles/confirm",
                 json=confirm_data,
                 timeout=5
@@ -134,7 +205,7 @@ def submit_request():
         }
         
         # Submit to backend
-        response = requests.post(
+        response = BACKEND_SESSION.post(
             f"{BACKEND_API}/api/solve-cvrp",
             json=request_data,
             headers={'Content-Type': 'application/json'},
@@ -160,11 +231,11 @@ def submit_request():
 def get_solution(request_id):
     """Get solution for a request (proxy to backend)"""
     try:
-        response = requests.get(
+        response = BACKEND_SESSION.get(
             f"{BACKEND_API}/api/solution/{request_id}",
             timeout=5
         )
-        return jsonify(response.json()), response.status_code
+        return proxy_response(response)
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
 
@@ -172,8 +243,8 @@ def get_solution(request_id):
 def get_agent_status():
     """Get current agent status (proxy to backend)"""
     try:
-        response = requests.get(f"{BACKEND_API}/api/agents/status", timeout=5)
-        return jsonify(response.json()), response.status_code
+        response = BACKEND_SESSION.get(f"{BACKEND_API}/api/agents/status", timeout=5)
+        return proxy_response(response)
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
 
@@ -181,8 +252,8 @@ def get_agent_status():
 def get_logs():
     """Get list of available agent logs (proxy to backend)"""
     try:
-        response = requests.get(f"{BACKEND_API}/log", timeout=5)
-        return jsonify(response.json()), response.status_code
+        response = BACKEND_SESSION.get(f"{BACKEND_API}/log", headers=conditional_request_headers(), timeout=5)
+        return proxy_response(response)
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
 
@@ -190,16 +261,15 @@ def get_logs():
 def get_agent_log(agent_name):
     """Get log for specific agent (proxy to backend)"""
     try:
-        response = requests.get(f"{BACKEND_API}/log/{agent_name}", timeout=5)
-        if response.status_code == 200:
-            return jsonify(response.json()), 200
-        else:
-            # Return error response from backend
-            try:
-                error_data = response.json()
-                return jsonify(error_data), response.status_code
-            except:
-                return jsonify({'error': f'Backend returned status {response.status_code}'}), response.status_code
+        response = BACKEND_SESSION.get(
+            f"{BACKEND_API}/log/{agent_name}",
+            headers=conditional_request_headers(),
+            timeout=5
+        )
+        if response.status_code in (200, 304) or response.headers.get('Content-Type', '').startswith('application/json'):
+            # Log bodies, 304s and backend JSON errors go through as-is
+            return proxy_response(response)
+        return jsonify({'error': f'Backend returned status {response.status_code}'}), response.status_code
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
 
@@ -207,11 +277,31 @@ def get_agent_log(agent_name):
 def get_movement():
     """Get all vehicle positions (proxy to backend)"""
     try:
-        response = requests.get(f"{BACKEND_API}/api/movement/all", timeout=5)
-        return jsonify(response.json()), response.status_code
+        response = BACKEND_SESSION.get(f"{BACKEND_API}/api/movement/all", timeout=5)
+        return proxy_response(response)
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
 
+@app.route('/api/movement/stream', methods=['GET'])
+def stream_movement():
+    """Stream vehicle position changes (proxy to backend Server-Sent Events)"""
+    try:
+        response = BACKEND_SESSION.get(f"{BACKEND_API}/api/movement/stream", stream=True, timeout=5)
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'Cannot connect to backend: {str(e)}'}), 503
+    
+    def generate():
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+        except requests.exceptions.RequestException:
+            # Backend went away - the browser's EventSource reconnects on its own
+            pass
+        finally:
+            response.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route('/api/test-cases/<filename>', methods=['GET'])
 def get_test_case(filename):
     """Load test case from JSON file"""
@@ -231,5 +321,10 @@ def get_test_case(filename):
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(host='localhost', port=5000, debug=True)
+    if os.environ.get('CVRP_PRODUCTION') == '1':
+        from waitress import serve
+        print(f"Serving CVRP frontend with waitress on localhost:5000 ({SERVER_THREADS} threads)")
+        serve(app, host='localhost', port=5000, threads=SERVER_THREADS)
+    else:
+        app.run(host='localhost', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1')
 